@@ -1,25 +1,44 @@
 from config import ENV_MAP
 import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
 import sys
 
+# One lazily created pool per environment, reused across get_db_connection calls
+_POOL = {}
+
 
 def get_db_connection(env='stg'):
+    """Return a PostgreSQL database connection from the env's connection pool.
+    Raises psycopg2.pool.PoolError if all of the pool's connections are in use.
+    """
     if env not in ENV_MAP.keys():
         raise ValueError(f"Invalid environment: {env}, available environments: {ENV_MAP.keys()}")
 
-    env_config = ENV_MAP[env]
+    pool = _POOL.get(env)
+    if pool is None:
+        env_config = ENV_MAP[env]
+        try:
+            # You can either set these as environment variables or modify directly
+            pool = ThreadedConnectionPool(
+                1,
+                8,
+                host=env_config['DB_HOST'],
+                port=env_config['DB_PORT'],
+                database=env_config['DB_NAME'],
+                user=env_config['DB_USER'],
+                password=env_config['DB_PASSWORD']
+            )
+        except psycopg2.Error as e:
+            print(f"Error connecting to PostgreSQL: {e}")
+            sys.exit(1)
+        _POOL[env] = pool
+    return pool.getconn()
+
 
-    """Create and return a PostgreSQL database connection."""
-    try:
-        # You can either set these as environment variables or modify directly
-        connection = psycopg2.connect(
-            host=env_config['DB_HOST'],
-            port=env_config['DB_PORT'],
-            database=env_config['DB_NAME'],
-            user=env_config['DB_USER'],
-            password=env_config['DB_PASSWORD']
-        )
-        return connection
-    except psycopg2.Error as e:
-        print(f"Error connecting to PostgreSQL: {e}")
-        sys.exit(1)
\ No newline at end of file
+def release_db_connection(connection, env='stg', close=False):
+    """Return a connection obtained from get_db_connection to its pool; close=True also closes it."""
+    pool = _POOL.get(env)
+    if pool is None:
+        connection.close()
+        return
+    pool.putconn(connection, close=close)
@@ -2,7 +2,7 @@
 """
 Convert facts with `sender_receiver` to `perspectives` on rules and write updated content to env file.
 
-- Connects using get_db_connection from helper.py
+- Connects using get_db_connection from helper.py (pooled per env; release with release_db_connection)
 - Loads rules containing `sender_receiver` in their JSON content
 - For each fact:
   - If `sender_receiver` is present:
@@ -24,20 +24,87 @@ Usage examples:
 """
 
 import argparse
+import io
 import json
 import os
 import re
-from typing import Any, Dict, List, Optional, Set, Tuple
-from datetime import datetime, timezone
-
-from psycopg2.extras import RealDictCursor
-
-from helper import get_db_connection
+import struct
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import batched, chain
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from psycopg2.extras import RealDictCursor, register_default_jsonb
+
+try:
+    import orjson
+except ImportError:  # optional speedup; fall back to the stdlib json module
+    orjson = None
+
+try:
+    import json5
+except ImportError:  # optional; parse_rule_content falls back to a naive quote repair
+    json5 = None
+
+from helper import get_db_connection, release_db_connection
 from config import ENV_MAP
 
 OUTPUT_DIR = "converted_rules"
 BACKUP_ROOT = "backups"
 
+# PostgreSQL binary COPY framing: signature, flags, header extension length / end-of-data marker
+_PGCOPY_SIGNATURE = b"PGCOPY\n\xff\r\n\x00"
+_PGCOPY_HEADER = _PGCOPY_SIGNATURE + struct.pack("!ii", 0, 0)
+_PGCOPY_TRAILER = struct.pack("!h", -1)
+# Rows per task submitted to the --fetch process pool
+_FETCH_BATCH_SIZE = 64
+# In-memory limit for load_rules' COPY buffer before it spills to a temp file
+_COPY_SPOOL_BYTES = 64 * 1024 * 1024
+
+# Backup file names written by apply_rules_from_env_file
+_RE_VALIDATION_BACKUP = re.compile(r"^rule_(\d+)_org_(\d+)_validation_(\d+)_original\.json$")
+_RE_RULE_BACKUP = re.compile(r"^rule_(\d+)_org_(\d+)_original\.json$")
+
+# Accepted (stripped, lower-cased) sender_receiver values -> canonical value
+_SR_ALIASES: Dict[str, str] = {
+    "sender": "sender",
+    "receiver": "receiver",
+    "sender_or_receiver": "sender_or_receiver",
+    "senderreceiver": "sender_or_receiver",
+    "both": "sender_or_receiver",
+    "s": "sender",
+    "r": "receiver",
+}
+
+# Shared perspective objects for the fields convert_fact emits. They are only ever
+# serialized, never mutated, so every fact can reference the same dict.
+_PERSP_BY_FIELD: Dict[str, Dict[str, str]] = {
+    field: {"type": "FIELD", "field": field, "model": "txn_event", "datatype": "text"}
+    for field in ("sender_entity_id", "receiver_entity_id", "sender_instrument_id", "receiver_instrument_id")
+}
+
+
+def _json_dumps(obj: Any, indent: bool = False) -> bytes:
+    """Serialize to UTF-8 JSON bytes, using orjson when it is installed."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, option=option)
+    return json.dumps(obj, indent=2 if indent else None, ensure_ascii=False).encode("utf-8")
+
+
+def _json_loads(data: Any) -> Any:
+    """Parse JSON from str or bytes. Raises json.JSONDecodeError (orjson's error subclasses it)."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _iso_now(fmt: str = "%Y-%m-%dT%H:%M:%SZ") -> str:
+    """Current UTC time formatted with strftime, without building a tz-aware datetime."""
+    return time.strftime(fmt, time.gmtime())
+
 
 def ensure_output_dir() -> None:
     os.makedirs(OUTPUT_DIR, exist_ok=True)
@@ -51,28 +118,84 @@ def ensure_backup_dir(env: str, timestamp: str) -> str:
 
 def save_env_output(env: str, entries: List[Dict[str, Any]]) -> str:
     """Save the rules to a JSON file."""
-    rules: Dict[int, Dict[str, Any]] = {}
-    for entry in entries:
-        rules[int(entry["id"])] = {
-            "id": int(entry["id"]),
-            "org_id": int(entry["org_id"]),
-            "content": entry["content"],
-        }
-    sorted_rules = list(sorted(rules.values(), key=lambda r: int(r["id"])) )
+    # Entries are unique by id (one row per rule from load_rules), so no de-duplication pass is needed.
+    sorted_rules = sorted(
+        ({"id": int(e["id"]), "org_id": int(e["org_id"]), "content": e["content"]} for e in entries),
+        key=lambda r: r["id"],
+    )
     out = {
         "env": env,
-        "updated_at": datetime.now(timezone.utc).isoformat() + "Z",
+        "updated_at": _iso_now(),
         "rules": sorted_rules,
     }
     path = os.path.join(OUTPUT_DIR, f"{env}.json")
-    with open(path, "w") as f:
-        json.dump(out, f, indent=2, ensure_ascii=False)
+    payload = _json_dumps(out, indent=True)
+    with open(path, "wb") as f:
+        f.write(payload)
     return path
 
 
-def load_rules(connection, org_id: Optional[int] = None) -> List[Dict[str, Any]]:
-    clauses: List[str] = ['rule.content::text ILIKE %s', 'rule.is_synchronous = %s', 'scenario.name = %s']
-    params: List[Any] = ['%"sender_receiver"%', False, 'custom_scenario']
+def _pg_int(data: bytes) -> int:
+    """Binary int2/int4/int8 value."""
+    return int.from_bytes(data, "big", signed=True)
+
+
+def _pg_jsonb_text(data: bytes) -> bytes:
+    """Binary jsonb value: a version byte followed by the JSON text. Returns the undecoded JSON bytes."""
+    return data[1:]
+
+
+def _pg_int_array(data: bytes) -> List[Optional[int]]:
+    """Binary one-dimensional integer array."""
+    ndim, _has_nulls, _elem_oid = struct.unpack_from("!iiI", data, 0)
+    if ndim == 0:
+        return []
+    (size, _lower_bound) = struct.unpack_from("!ii", data, 12)
+    offset = 20
+    result: List[Optional[int]] = []
+    for _ in range(size):
+        (length,) = struct.unpack_from("!i", data, offset)
+        offset += 4
+        if length == -1:
+            result.append(None)
+            continue
+        result.append(_pg_int(data[offset:offset + length]))
+        offset += length
+    return result
+
+
+def _pgcopy_rows(f, decoders: Tuple[Callable[[bytes], Any], ...]) -> Iterator[Tuple[Any, ...]]:
+    """Decode a COPY ... TO STDOUT WITH (FORMAT BINARY) stream, one decoder per column."""
+    header = f.read(len(_PGCOPY_HEADER))
+    if header[:len(_PGCOPY_SIGNATURE)] != _PGCOPY_SIGNATURE:
+        raise ValueError("Not a PostgreSQL binary COPY stream")
+    (extension_length,) = struct.unpack_from("!i", header, len(_PGCOPY_SIGNATURE) + 4)
+    f.read(extension_length)
+    while True:
+        (field_count,) = struct.unpack("!h", f.read(2))
+        if field_count == -1:
+            return
+        values = []
+        for decode in decoders:
+            (length,) = struct.unpack("!i", f.read(4))
+            values.append(None if length == -1 else decode(f.read(length)))
+        yield tuple(values)
+
+
+def load_rules(connection, org_id: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """Yield candidate rules fetched with binary COPY ... TO STDOUT.
+    The whole COPY result is received before the first row is yielded; it is spooled to a temporary file
+    (in memory up to _COPY_SPOOL_BYTES, on disk past that) and then decoded one row at a time. `content`
+    is yielded as raw JSON bytes so parsing happens in parse_rule_content, i.e. in the --fetch workers.
+    """
+    # jsonpath existence check on the facts array; served by the GIN index in sql/rule_content_gin.sql
+    # instead of casting every document to text for a sequential ILIKE scan.
+    clauses: List[str] = [
+        "rule.content @? '$.specification.facts[*].sender_receiver'",
+        'rule.is_synchronous = %s',
+        'scenario.name = %s',
+    ]
+    params: List[Any] = [False, 'custom_scenario']
 
     if org_id is not None:
         clauses.append("rule.org_id = %s")
@@ -80,19 +203,41 @@ def load_rules(connection, org_id: Optional[int] = None) -> List[Dict[str, Any]]
 
     where_sql = f"WHERE {' AND '.join(clauses)}" if clauses else ""
     sql = f"""
-        SELECT rule.id, rule.content, rule.org_id
+        SELECT
+            rule.id,
+            rule.content,
+            rule.org_id,
+            -- Positions of facts carrying sender_receiver, so process_rule only visits those
+            ARRAY(
+                SELECT f.ord - 1
+                FROM jsonb_array_elements(
+                    CASE WHEN jsonb_typeof(rule.content #> '{{specification,facts}}') = 'array'
+                         THEN rule.content #> '{{specification,facts}}'
+                         ELSE '[]'::jsonb
+                    END
+                ) WITH ORDINALITY AS f(fact, ord)
+                WHERE jsonb_typeof(f.fact) = 'object' AND f.fact ? 'sender_receiver'
+                ORDER BY f.ord
+            ) AS affected_fact_indexes
         FROM rule
         JOIN scenario ON scenario.id = rule.scenario_id
         {where_sql}
         ORDER BY id
     """
 
-    with connection.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute(sql, params)
-        return list(cur.fetchall())
+    with connection.cursor() as cur, tempfile.SpooledTemporaryFile(max_size=_COPY_SPOOL_BYTES) as buf:
+        query = cur.mogrify(sql, params).decode()
+        cur.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT BINARY)", buf)
+        buf.seek(0)
+        decoders = (_pg_int, _pg_jsonb_text, _pg_int, _pg_int_array)
+        for values in _pgcopy_rows(buf, decoders):
+            yield dict(zip(("id", "content", "org_id", "affected_fact_indexes"), values))
 
 
 def to_perspective_object(field_name: str) -> Dict[str, str]:
+    cached = _PERSP_BY_FIELD.get(field_name)
+    if cached is not None:
+        return cached
     return {
         "type": "FIELD",
         "field": field_name,
@@ -102,18 +247,7 @@ def to_perspective_object(field_name: str) -> Dict[str, str]:
 
 
 def normalize_sender_receiver(value: Any) -> Optional[str]:
-    if not isinstance(value, str):
-        return None
-    v = value.strip().lower()
-    if v in ("sender", "receiver", "sender_or_receiver"):
-        return v
-    if v == "senderreceiver" or v == "both" or v == "sender_or_receiver":
-        return "sender_or_receiver"
-    if v == "s":
-        return "sender"
-    if v == "r":
-        return "receiver"
-    return None
+    return _SR_ALIASES.get(value.strip().lower()) if isinstance(value, str) else None
 
 
 def parse_rule_content(raw_content: Any) -> Optional[Dict[str, Any]]:
@@ -121,42 +255,48 @@ def parse_rule_content(raw_content: Any) -> Optional[Dict[str, Any]]:
         return None
     if isinstance(raw_content, dict):
         return raw_content
+    if isinstance(raw_content, bytes):
+        # jsonb text straight from load_rules' COPY stream; always valid JSON
+        try:
+            return _json_loads(raw_content)
+        except json.JSONDecodeError:
+            return None
     if isinstance(raw_content, str):
         try:
-            return json.loads(raw_content)
+            return _json_loads(raw_content)
         except json.JSONDecodeError:
             try:
+                if json5 is not None:
+                    # Handles single-quoted / Python-dict style content without mangling apostrophes in values
+                    return json5.loads(raw_content)
                 repaired = raw_content.replace("'", '"')
-                return json.loads(repaired)
+                return _json_loads(repaired)
             except Exception:
                 return None
     return None
 
 
 def merge_perspectives(existing: List[Dict[str, str]], additions: List[Dict[str, str]]) -> List[Dict[str, str]]:
-    seen: Set[str] = set()
-    result: List[Dict[str, str]] = []
-    for obj in (existing or []) + additions:
-        if not isinstance(obj, dict):
-            continue
-        field = obj.get("field")
-        if not field:
-            continue
-        key = field.strip().lower()
-        if key in seen:
-            continue
-        seen.add(key)
-        result.append(to_perspective_object(field))
-    return result
+    # Insertion-ordered dict keyed by normalized field: de-duplicates without a separate seen set
+    acc: Dict[str, Dict[str, str]] = {}
+    for obj in chain(existing or (), additions):
+        if type(obj) is dict and (field := obj.get("field")):
+            key = field.strip().lower()
+            # Check before building: setdefault would evaluate to_perspective_object for duplicates too
+            if key not in acc:
+                acc[key] = to_perspective_object(field)
+    return list(acc.values())
 
 
 def convert_fact(fact: Dict[str, Any]) -> bool:
     """Convert sender_receiver to perspectives on a single fact. Returns True if updated."""
-    if not isinstance(fact, dict):
+    # Most facts carry no sender_receiver, so bail out before any normalization work
+    sr_val = fact.get("sender_receiver") if type(fact) is dict else None
+    if sr_val is None:
         return False
-    sr_val = fact.get("sender_receiver")
-    sr = normalize_sender_receiver(sr_val)
-    if not sr:
+    # Inlined normalize_sender_receiver to save a call per fact
+    sr = _SR_ALIASES.get(sr_val.strip().lower()) if isinstance(sr_val, str) else None
+    if sr is None:
         return False
 
     if fact.get("type") == "ENTITY_VALUE_FACT" or fact.get("event_subtype") == "ACTION_EVENT":
@@ -181,132 +321,251 @@ def process_rule(row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         print(f"Rule {rule_id}: unable to parse content; skipping")
         return None
 
+    # Exact type checks: content comes from a JSON parser, which only produces plain dict/list
     spec = content.get("specification")
-    if not isinstance(spec, dict):
+    if type(spec) is not dict:
         return None
 
     facts = spec.get("facts")
-    if not isinstance(facts, list):
+    if type(facts) is not list:
         return None
 
+    # load_rules pre-selects the facts holding sender_receiver; fall back to a full scan for rows without it
+    affected = row.get("affected_fact_indexes")
+    candidates = facts if affected is None else (facts[i] for i in affected if i < len(facts))
+
     updated = False
-    for fact in facts:
+    for fact in candidates:
         if convert_fact(fact):
             updated = True
 
     return content if updated else None
 
 
+def convert_row(row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Convert one loaded rule row; returns its env file entry, or None if nothing changed.
+    Module-level so it can run in a ProcessPoolExecutor worker.
+    """
+    updated_content = process_rule(row)
+    if updated_content is None:
+        return None
+    return {"id": row["id"], "org_id": row["org_id"], "content": updated_content}
+
+
+def convert_batch(rows: Tuple[Dict[str, Any], ...]) -> List[Optional[Dict[str, Any]]]:
+    """Worker entry point: convert_row over one batch, so pickling and IPC are paid per batch."""
+    return [convert_row(row) for row in rows]
+
+
+def convert_rows_in_pool(rows: Iterable[Dict[str, Any]], max_workers: int) -> Iterator[Optional[Dict[str, Any]]]:
+    """Run convert_row over rows in a process pool, yielding results in input order.
+    Rows are submitted in batches of _FETCH_BATCH_SIZE with at most two batches per worker in flight,
+    so the input is consumed as results drain rather than queued up front as Executor.map would.
+    """
+    in_flight: Deque["Future[List[Optional[Dict[str, Any]]]]"] = deque()
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for batch in batched(rows, _FETCH_BATCH_SIZE):
+            in_flight.append(executor.submit(convert_batch, batch))
+            if len(in_flight) >= 2 * max_workers:
+                yield from in_flight.popleft().result()
+        while in_flight:
+            yield from in_flight.popleft().result()
+
+
+def _pgcopy_binary(rows: List[Tuple[Any, ...]]) -> io.BytesIO:
+    """Encode rows for COPY ... FROM STDIN WITH (FORMAT BINARY).
+    Every column but the last is written as bigint; the last is written as jsonb.
+    """
+    buf = io.BytesIO()
+    buf.write(_PGCOPY_HEADER)
+    for row in rows:
+        *ids, content = row
+        buf.write(struct.pack("!h", len(row)))
+        for value in ids:
+            buf.write(struct.pack("!iq", 8, value))
+        payload = _json_dumps(content)
+        # jsonb binary representation: version byte (1) followed by the JSON text
+        buf.write(struct.pack("!ib", len(payload) + 1, 1))
+        buf.write(payload)
+    buf.write(_PGCOPY_TRAILER)
+    buf.seek(0)
+    return buf
+
+
+def update_rule_contents(cur, rows: List[Tuple[int, int, Any]]) -> None:
+    """Write (rule_id, org_id, content) rows to rule.content: binary COPY into a temp table, then one UPDATE."""
+    if not rows:
+        return
+    cur.execute("CREATE TEMP TABLE _rule_staging (id bigint, org_id bigint, content jsonb) ON COMMIT DROP")
+    cur.copy_expert("COPY _rule_staging FROM STDIN WITH (FORMAT BINARY)", _pgcopy_binary(rows))
+    cur.execute(
+        """
+        UPDATE rule SET content = s.content
+        FROM _rule_staging s
+        WHERE rule.id = s.id AND rule.org_id = s.org_id
+        """
+    )
+
+
+def update_validation_contents(cur, rows: List[Tuple[int, Any]]) -> None:
+    """Write (rule_validation_id, content) rows to rule_validation.rule_content via the same staging approach."""
+    if not rows:
+        return
+    cur.execute("CREATE TEMP TABLE _rule_validation_staging (id bigint, content jsonb) ON COMMIT DROP")
+    cur.copy_expert("COPY _rule_validation_staging FROM STDIN WITH (FORMAT BINARY)", _pgcopy_binary(rows))
+    cur.execute(
+        """
+        UPDATE rule_validation SET rule_content = s.content
+        FROM _rule_validation_staging s
+        WHERE rule_validation.id = s.id
+        """
+    )
+
+
+def _backup_payload(existing: Any) -> Any:
+    """Return stored rule content in a JSON-serializable form for a backup file."""
+    if isinstance(existing, dict):
+        return existing
+    try:
+        return _json_loads(existing) if isinstance(existing, str) else existing
+    except Exception:
+        return {"raw": existing}
+
+
+def _write_backup(task: Tuple[str, Any]) -> Optional[Exception]:
+    """Write one backup file. Returns the error instead of raising so a thread pool map reports every file."""
+    path, to_dump = task
+    try:
+        payload = memoryview(_json_dumps(to_dump, indent=True))
+        # Unbuffered fd: the whole document goes out in one write() (looped only on a short write)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            while payload:
+                payload = payload[os.write(fd, payload):]
+        finally:
+            os.close(fd)
+    except Exception as e:
+        return e
+    return None
+
+
 def apply_rules_from_env_file(connection, env: str) -> str:
     """Apply rule contents from an env JSON file back into the database with backups.
     If rule.status = 'VALIDATION', updates the latest rule_validation.rule_content instead of rule.content.
+    All reads and writes run in one transaction with synchronous_commit off: the final commit does not wait
+    for the WAL flush, so a server crash right after it can lose the update. That is acceptable here because
+    the original contents are backed up to disk before anything is written and can be restored with --restore.
     Returns the backup directory path created for this run.
     """
     path = os.path.join(OUTPUT_DIR, f"{env}.json")
     if not os.path.exists(path):
         raise FileNotFoundError(f"Env file not found: {path}")
 
-    with open(path, "r") as f:
-        data = json.load(f)
+    with open(path, "rb") as f:
+        data = _json_loads(f.read())
 
     rules = data.get("rules", []) if isinstance(data, dict) else []
-    timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    timestamp = _iso_now("%Y%m%dT%H%M%SZ")
     backup_dir = ensure_backup_dir(env, timestamp)
 
-    updated_count = 0
+    pending: List[Tuple[int, int, Any]] = []
+    for item in rules:
+        try:
+            rule_id = int(item["id"]) if "id" in item else None
+            org_id = int(item["org_id"]) if "org_id" in item else None
+            content = item.get("content")
+        except Exception:
+            continue
+        if rule_id is None or org_id is None or content is None:
+            continue
+        pending.append((rule_id, org_id, content))
+
+    rule_updates: List[Tuple[int, int, Any]] = []
+    validation_updates: List[Tuple[int, Any]] = []
+    connection.autocommit = False
     with connection.cursor(cursor_factory=RealDictCursor) as cur:
-        for item in rules:
-            try:
-                rule_id = int(item["id"]) if "id" in item else None
-                org_id = int(item["org_id"]) if "org_id" in item else None
-                content = item.get("content")
-            except Exception:
-                continue
-            if rule_id is None or org_id is None or content is None:
-                continue
+        # Transaction-scoped settings; SET LOCAL reverts on commit/rollback
+        cur.execute("SET LOCAL synchronous_commit = off")
+        cur.execute("SET LOCAL statement_timeout = 0")
+        cur.execute("SET CONSTRAINTS ALL DEFERRED")
+
+        # Prefetch status and current content for every rule in one round trip
+        cur.execute(
+            """
+            SELECT id, org_id, status, content
+            FROM rule
+            WHERE (id, org_id) IN (SELECT * FROM unnest(%s::bigint[], %s::bigint[]))
+            """,
+            ([p[0] for p in pending], [p[1] for p in pending]),
+        )
+        current: Dict[Tuple[int, int], Dict[str, Any]] = {
+            (int(r["id"]), int(r["org_id"])): r for r in cur.fetchall()
+        }
+
+        # Latest validation record for every rule in VALIDATION
+        validation_rule_ids = [key[0] for key, r in current.items() if r["status"] == "VALIDATION"]
+        latest_validation: Dict[int, Dict[str, Any]] = {}
+        if validation_rule_ids:
+            cur.execute(
+                """
+                SELECT DISTINCT ON (rule_id) rule_id, id, rule_content
+                FROM rule_validation
+                WHERE rule_id = ANY(%s)
+                ORDER BY rule_id, created_at DESC NULLS LAST, id DESC
+                """,
+                (validation_rule_ids,),
+            )
+            latest_validation = {int(r["rule_id"]): r for r in cur.fetchall()}
 
-            # Determine rule status
-            cur.execute("SELECT status FROM rule WHERE id = %s AND org_id = %s", (rule_id, org_id))
-            rule_row = cur.fetchone()
+        # (backup_path, original content, failure label, kind, update row) per rule to update
+        planned: List[Tuple[str, Any, str, str, Tuple[Any, ...]]] = []
+        for rule_id, org_id, content in pending:
+            rule_row = current.get((rule_id, org_id))
             if not rule_row:
                 print(f"Rule {rule_id} (org {org_id}) not found; skipping")
                 continue
-            status = rule_row.get("status") if isinstance(rule_row, dict) else rule_row[0]
+            status = rule_row["status"]
 
             if status == "VALIDATION":
-                # Fetch latest validation record
-                cur.execute(
-                    """
-                    SELECT id, rule_content
-                    FROM rule_validation
-                    WHERE rule_id = %s
-                    ORDER BY created_at DESC NULLS LAST, id DESC
-                    LIMIT 1
-                    """,
-                    (rule_id,),
-                )
-                rv = cur.fetchone()
+                rv = latest_validation.get(rule_id)
                 if not rv:
                     print(f"Rule {rule_id} in VALIDATION but no rule_validation row found; skipping")
                     continue
-                rv_id = rv.get("id") if isinstance(rv, dict) else rv[0]
-                rv_content = rv.get("rule_content") if isinstance(rv, dict) else rv[1]
-
-                # Backup existing validation content
-                backup_path = os.path.join(backup_dir, f"rule_{rule_id}_org_{org_id}_validation_{rv_id}_original.json")
-                try:
-                    if isinstance(rv_content, dict):
-                        to_dump = rv_content
-                    else:
-                        try:
-                            to_dump = json.loads(rv_content) if isinstance(rv_content, str) else rv_content
-                        except Exception:
-                            to_dump = {"raw": rv_content}
-                    with open(backup_path, "w") as bf:
-                        json.dump(to_dump, bf, indent=2, ensure_ascii=False)
-                except Exception as e:
-                    print(f"Backup failed for rule_validation {rv_id} (rule {rule_id}): {e}")
-                    continue
-
-                # Update validation content
-                cur.execute(
-                    "UPDATE rule_validation SET rule_content = %s WHERE id = %s",
-                    (json.dumps(content), rv_id),
-                )
-                updated_count += 1
+                rv_id = rv["id"]
+                planned.append((
+                    os.path.join(backup_dir, f"rule_{rule_id}_org_{org_id}_validation_{rv_id}_original.json"),
+                    _backup_payload(rv["rule_content"]),
+                    f"rule_validation {rv_id} (rule {rule_id})",
+                    "validation",
+                    (rv_id, content),
+                ))
             else:
-                # Backup current rule content
-                cur.execute("SELECT content FROM rule WHERE id = %s AND org_id = %s", (rule_id, org_id))
-                row = cur.fetchone()
-                if not row:
-                    print(f"Rule {rule_id} (org {org_id}) not found when backing up; skipping")
-                    continue
-
-                backup_path = os.path.join(backup_dir, f"rule_{rule_id}_org_{org_id}_original.json")
-                try:
-                    existing = row["content"] if isinstance(row, dict) else row[0]
-                    if isinstance(existing, dict):
-                        to_dump = existing
-                    else:
-                        try:
-                            to_dump = json.loads(existing) if isinstance(existing, str) else existing
-                        except Exception:
-                            to_dump = {"raw": existing}
-                    with open(backup_path, "w") as bf:
-                        json.dump(to_dump, bf, indent=2, ensure_ascii=False)
-                except Exception as e:
-                    print(f"Backup failed for rule {rule_id} (org {org_id}): {e}")
-                    continue
-
-                # Update rule content
-                cur.execute(
-                    "UPDATE rule SET content = %s WHERE id = %s AND org_id = %s",
-                    (json.dumps(content), rule_id, org_id),
-                )
-                updated_count += 1
+                planned.append((
+                    os.path.join(backup_dir, f"rule_{rule_id}_org_{org_id}_original.json"),
+                    _backup_payload(rule_row["content"]),
+                    f"rule {rule_id} (org {org_id})",
+                    "rule",
+                    (rule_id, org_id, content),
+                ))
+
+        # Write backups in parallel before any row is touched; a rule is only updated once its backup is on disk
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            errors = list(executor.map(_write_backup, [(p[0], p[1]) for p in planned]))
+
+        for (_, _, label, kind, update_row), error in zip(planned, errors):
+            if error is not None:
+                print(f"Backup failed for {label}: {error}")
+                continue
+            if kind == "validation":
+                validation_updates.append(update_row)
+            else:
+                rule_updates.append(update_row)
 
+        update_rule_contents(cur, rule_updates)
+        update_validation_contents(cur, validation_updates)
         connection.commit()
 
+    updated_count = len(rule_updates) + len(validation_updates)
     print(f"Applied {updated_count} rule(s) from {path}. Backups at {backup_dir}")
     return backup_dir
 
@@ -315,13 +574,13 @@ def _parse_backup_filename(filename: str) -> Optional[Tuple[str, Dict[str, int]]
     """Parse backup filename to determine type and identifiers.
     Returns (kind, ids) where kind is 'rule' or 'validation'.
     """
-    m_val = re.match(r"^rule_(\d+)_org_(\d+)_validation_(\d+)_original\.json$", filename)
+    m_val = _RE_VALIDATION_BACKUP.match(filename)
     if m_val:
         return (
             "validation",
             {"rule_id": int(m_val.group(1)), "org_id": int(m_val.group(2)), "validation_id": int(m_val.group(3))},
         )
-    m_rule = re.match(r"^rule_(\d+)_org_(\d+)_original\.json$", filename)
+    m_rule = _RE_RULE_BACKUP.match(filename)
     if m_rule:
         return ("rule", {"rule_id": int(m_rule.group(1)), "org_id": int(m_rule.group(2))})
     return None
@@ -338,8 +597,10 @@ def restore_from_backup(connection, env: str, backup_timestamp: Optional[str] =
     if not os.path.isdir(directory):
         raise FileNotFoundError(f"Backup directory not found: {directory}")
 
-    restored = 0
-    files = sorted(f for f in os.listdir(directory) if f.endswith(".json"))
+    rule_updates: List[Tuple[int, int, Any]] = []
+    validation_updates: List[Tuple[int, Any]] = []
+    with os.scandir(directory) as it:
+        files = sorted(e.name for e in it if e.is_file() and e.name.endswith(".json"))
 
     with connection.cursor(cursor_factory=RealDictCursor) as cur:
         for fname in files:
@@ -352,28 +613,22 @@ def restore_from_backup(connection, env: str, backup_timestamp: Optional[str] =
 
             full_path = os.path.join(directory, fname)
             try:
-                with open(full_path, "r") as f:
-                    content = json.load(f)
+                with open(full_path, "rb") as f:
+                    content = _json_loads(f.read())
             except Exception as e:
                 print(f"Failed to read backup {fname}: {e}")
                 continue
 
             if kind == "validation":
-                validation_id = ids["validation_id"]
-                cur.execute(
-                    "UPDATE rule_validation SET rule_content = %s WHERE id = %s",
-                    (json.dumps(content), validation_id),
-                )
-                restored += 1
+                validation_updates.append((ids["validation_id"], content))
             else:
-                # rule content
-                cur.execute(
-                    "UPDATE rule SET content = %s WHERE id = %s AND org_id = %s",
-                    (json.dumps(content), rule_id, org_id),
-                )
-                restored += 1
+                rule_updates.append((rule_id, org_id, content))
+
+        update_rule_contents(cur, rule_updates)
+        update_validation_contents(cur, validation_updates)
         connection.commit()
 
+    restored = len(rule_updates) + len(validation_updates)
     print(f"Restored {restored} item(s) from {directory}")
     return directory
 
@@ -389,6 +644,8 @@ def main():
     args = parser.parse_args()
 
     conn = get_db_connection(args.env)
+    # Decode jsonb columns with the same (orjson-backed) parser used for files
+    register_default_jsonb(conn, loads=_json_loads)
 
     # Restore path
     if args.restore:
@@ -400,7 +657,8 @@ def main():
             )
             print(f"Restored from: {directory}")
         finally:
-            conn.close()
+            # One-shot CLI run: hand the connection back to the pool and close it
+            release_db_connection(conn, args.env, close=True)
             print("Database connection closed.")
         return
 
@@ -410,7 +668,7 @@ def main():
             backup_dir = apply_rules_from_env_file(conn, args.env)
             print(f"Backups stored under: {backup_dir}")
         finally:
-            conn.close()
+            release_db_connection(conn, args.env, close=True)
             print("Database connection closed.")
         return
 
@@ -426,21 +684,21 @@ def main():
             except Exception as e:
                 print(f"Warning: failed to delete existing env file: {e}")
 
-            rows = load_rules(conn, org_id=args.org_id)
-            print(f"Loaded {len(rows)} candidate rules")
             aggregated: List[Dict[str, Any]] = []
-            converted = 0
-            for row in rows:
-                updated_content = process_rule(row)
-                if updated_content is not None:
-                    aggregated.append({"id": row["id"], "org_id": row["org_id"], "content": updated_content})
-                    converted += 1
+            loaded = 0
+            # JSON parsing and conversion are pure CPU work, so fan them out across processes
+            for entry in convert_rows_in_pool(load_rules(conn, org_id=args.org_id), os.cpu_count() or 1):
+                loaded += 1
+                if entry is not None:
+                    aggregated.append(entry)
+            converted = len(aggregated)
+            print(f"Loaded {loaded} candidate rules")
             if aggregated:
                 out_path = save_env_output(args.env, aggregated)
                 print(f"Wrote {len(aggregated)} updated rule(s) to {out_path}")
-            print(f"Done. Converted {converted} of {len(rows)} rules.")
+            print(f"Done. Converted {converted} of {loaded} rules.")
         finally:
-            conn.close()
+            release_db_connection(conn, args.env, close=True)
             print("Database connection closed.")
 
 
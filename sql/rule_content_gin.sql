@@ -0,0 +1,9 @@
+-- GIN index backing the `rule.content @? '$.specification.facts[*].sender_receiver'` predicate in load_rules.
+-- Uses the default jsonb_ops operator class: jsonb_path_ops cannot index key-existence jsonpath queries.
+-- Requires PostgreSQL 12+ (jsonpath). Run outside a transaction block because of CONCURRENTLY.
+--
+-- Verify with:
+--   EXPLAIN (ANALYZE, BUFFERS)
+--   SELECT rule.id FROM rule WHERE rule.content @? '$.specification.facts[*].sender_receiver';
+-- which should show a Bitmap Index Scan on rule_content_gin rather than a Seq Scan on rule.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS rule_content_gin ON rule USING gin (content);
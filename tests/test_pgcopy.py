@@ -0,0 +1,91 @@
+"""Round-trip checks for the hand-rolled PostgreSQL binary COPY encoder/decoder in main.py."""
+
+import io
+import struct
+
+import pytest
+
+from main import (
+    _PGCOPY_HEADER,
+    _PGCOPY_TRAILER,
+    _json_loads,
+    _pg_int,
+    _pg_int_array,
+    _pg_jsonb_text,
+    _pgcopy_binary,
+    _pgcopy_rows,
+)
+
+
+def _jsonb(data: bytes):
+    return _json_loads(_pg_jsonb_text(data))
+
+
+def test_rule_rows_round_trip():
+    rows = [
+        (1, 10, {"specification": {"facts": [{"sender_receiver": "both", "note": "it's"}]}}),
+        (2**40, -3, {"unicode": "é✓", "nested": [1, None, True, 2.5]}),
+    ]
+    decoded = list(_pgcopy_rows(_pgcopy_binary(rows), (_pg_int, _pg_int, _jsonb)))
+    assert decoded == rows
+
+
+def test_validation_rows_round_trip():
+    rows = [(99, {"old": True}), (100, [])]
+    decoded = list(_pgcopy_rows(_pgcopy_binary(rows), (_pg_int, _jsonb)))
+    assert decoded == rows
+
+
+def test_binary_framing():
+    data = _pgcopy_binary([(7, {"a": 1})]).getvalue()
+    assert data.startswith(_PGCOPY_HEADER)
+    assert data.endswith(_PGCOPY_TRAILER)
+    body = data[len(_PGCOPY_HEADER):-len(_PGCOPY_TRAILER)]
+    # field count, int8 id, then jsonb with its version byte
+    assert body[:2] == struct.pack("!h", 2)
+    assert body[2:14] == struct.pack("!iq", 8, 7)
+    (jsonb_length,) = struct.unpack_from("!i", body, 14)
+    assert body[18:19] == b"\x01"
+    assert len(body) == 18 + jsonb_length
+
+
+def test_empty_input_is_header_and_trailer_only():
+    data = _pgcopy_binary([]).getvalue()
+    assert data == _PGCOPY_HEADER + _PGCOPY_TRAILER
+    assert list(_pgcopy_rows(_pgcopy_binary([]), (_pg_int, _jsonb))) == []
+
+
+def test_null_field_decodes_to_none():
+    data = _pgcopy_binary([(1, {"a": 1})]).getvalue()
+    null_row = struct.pack("!hiqi", 2, 8, 5, -1)
+    patched = data[:-len(_PGCOPY_TRAILER)] + null_row + _PGCOPY_TRAILER
+
+    assert list(_pgcopy_rows(io.BytesIO(patched), (_pg_int, _jsonb))) == [(1, {"a": 1}), (5, None)]
+
+
+def test_rejects_non_copy_stream():
+    with pytest.raises(ValueError):
+        list(_pgcopy_rows(io.BytesIO(b"not a copy stream at all"), (_pg_int,)))
+
+
+def test_pg_int_widths():
+    assert _pg_int(struct.pack("!h", -2)) == -2
+    assert _pg_int(struct.pack("!i", 123456)) == 123456
+    assert _pg_int(struct.pack("!q", -(2**40))) == -(2**40)
+
+
+def test_pg_int_array_int8():
+    # ndim=1, has_nulls=1, element oid 20 (int8), dim size 3, lower bound 1, then elements
+    payload = (
+        struct.pack("!iiIii", 1, 1, 20, 3, 1)
+        + struct.pack("!iq", 8, 0)
+        + struct.pack("!i", -1)
+        + struct.pack("!iq", 8, 2**33)
+    )
+    assert _pg_int_array(payload) == [0, None, 2**33]
+
+
+def test_pg_int_array_int4_and_empty():
+    payload = struct.pack("!iiIii", 1, 0, 23, 2, 1) + struct.pack("!ii", 4, 4) + struct.pack("!ii", 4, 7)
+    assert _pg_int_array(payload) == [4, 7]
+    assert _pg_int_array(struct.pack("!iiI", 0, 0, 20)) == []